@@ -0,0 +1,414 @@
+# Chunking engine behind app.py
+# - Inventory of the input tree
+# - Rejoinable splits of large files, bin-packed independent parts
+# - Part cache and the final ALL_CHUNKS.zip
+#
+# Kept free of Streamlit so worker processes can import it on their own.
+
+import os
+import zipfile
+import zlib
+import shutil
+from pathlib import Path
+import time
+import heapq
+import itertools
+import queue
+import threading
+import sqlite3
+import hashlib
+import tarfile
+import numpy as np
+from collections import namedtuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# ISA-L's SIMD deflate/crc32 and zlib-ng's PCLMULQDQ/VPCLMULQDQ crc32, when installed
+try:
+    from isal import isal_zlib
+except ImportError:
+    isal_zlib = None
+
+try:
+    from zlib_ng import zlib_ng
+except ImportError:
+    zlib_ng = None
+
+def _use_fast_zlib():
+    # Pool initializer. zipfile only looks up a module-level zlib/crc32, so the swap is
+    # process-wide; it is made in the worker processes alone, which run nothing but the
+    # part builders below. The Streamlit server process keeps stock zipfile. ISA-L only
+    # accepts levels 0-3, and every deflating writer here uses 1.
+    if isal_zlib is not None:
+        zipfile.zlib = isal_zlib
+        zipfile.crc32 = isal_zlib.crc32
+    # Keep stock crc32 unless zlib-ng agrees with it on a 1 MiB probe
+    if zlib_ng is not None:
+        probe = bytes(range(256)) * 4096
+        if zlib_ng.crc32(probe) == zlib.crc32(probe):
+            if isal_zlib is None:
+                zipfile.zlib = zlib_ng
+            zipfile.crc32 = zlib_ng.crc32
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+OUTPUT_FORMATS = ["zip", "tar.zst"] if zstandard is not None else ["zip"]
+
+# Already-compressed formats: deflating them again costs CPU for <1% gain
+_INCOMPRESSIBLE = {'.zip', '.gz', '.xz', '.7z', '.mp4', '.mkv', '.mov', '.jpg', '.jpeg',
+                   '.png', '.webp', '.pdf', '.mp3', '.flac'}
+
+def _compress_type(name):
+    if os.path.splitext(name)[1].lower() in _INCOMPRESSIBLE:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def _iter_files(root):
+    # Yields (path, stat) for regular files from an iterative os.scandir DFS. d_type
+    # from getdents sorts dirs from files without a syscall; each file is stat'ed once
+    # for its size. os.fwalk would add an open, stat and fstat per directory.
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+
+# One inventory entry per input file; arcname is the path relative to the input root
+FileRec = namedtuple("FileRec", "path arcname size mtime mode")
+
+def _file_rec(path, arcname, stat_result):
+    return FileRec(path, arcname, stat_result.st_size, stat_result.st_mtime, stat_result.st_mode)
+
+def build_inventory(root):
+    # The only walk of the input tree; every later stage works from this list
+    base_len = len(os.path.join(root, ""))
+    return [_file_rec(path, path[base_len:], stat_result) for path, stat_result in _iter_files(root)]
+
+def _zip_info(rec, compress_type, compresslevel):
+    # What ZipInfo.from_file() fills in, but from the stat taken during the walk
+    date_time = time.localtime(rec.mtime)[:6]
+    # Same clamping as strict_timestamps=False: zip dates cover 1980-2107 only
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    zinfo = zipfile.ZipInfo(rec.arcname, date_time)
+    zinfo.external_attr = (rec.mode & 0xFFFF) << 16
+    zinfo.file_size = rec.size
+    zinfo.compress_type = compress_type
+    zinfo._compresslevel = compresslevel
+    return zinfo
+
+class _StreamingZipWriter:
+    # Stand-in for ZipFile.write that overlaps disk reads with deflate: a reader
+    # thread fills a bounded queue while this thread feeds zipfile's entry stream
+    BLOCK_SIZE = 1 << 20
+    QUEUE_DEPTH = 4
+    # Shorter entries are read inline: starting the reader thread and handing blocks
+    # across costs more than the overlap wins back
+    OVERLAP_MIN_BLOCKS = 8
+
+    def __init__(self, zipf):
+        self.zipf = zipf
+        # Read buffers, grown on demand and reused by every entry this writer handles
+        self._bufs = []
+
+    def _buffers(self, count):
+        while len(self._bufs) < count:
+            self._bufs.append(bytearray(self.BLOCK_SIZE))
+        return self._bufs[:count]
+
+    def _read_ranges(self, src, offset, length, bufs):
+        # Yields views of the next up-to-BLOCK_SIZE bytes, cycling through bufs
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(src.fileno(), offset, length, os.POSIX_FADV_SEQUENTIAL)
+        src.seek(offset)
+        for buf in itertools.cycle(bufs):
+            n = src.readinto(memoryview(buf)[:min(self.BLOCK_SIZE, length)]) if length else 0
+            if not n:
+                return
+            length -= n
+            yield memoryview(buf)[:n]
+
+    def _read_blocks(self, file_path, offset, length, blocks, stop):
+        # Queued + in-flight blocks never exceed QUEUE_DEPTH + 2, so that many buffers suffice
+        try:
+            with open(file_path, "rb") as src:
+                for block in self._read_ranges(src, offset, length, self._buffers(self.QUEUE_DEPTH + 2)):
+                    if stop.is_set():
+                        break
+                    blocks.put(block)
+            blocks.put(None)
+        except BaseException as e:
+            blocks.put(e)
+
+    def write(self, file_path, zinfo, offset=0, sha1=None):
+        # Writes zinfo.file_size bytes of the source from offset, so a large file can
+        # go in as several part entries. Returns the SHA-1 of everything fed to sha1,
+        # taken from the same blocks that get compressed.
+        sha1 = hashlib.sha1() if sha1 is None else sha1
+        if zinfo.file_size < self.OVERLAP_MIN_BLOCKS * self.BLOCK_SIZE:
+            with open(file_path, "rb") as src, self.zipf.open(zinfo, 'w') as dest:
+                for block in self._read_ranges(src, offset, zinfo.file_size, self._buffers(1)):
+                    sha1.update(block)
+                    dest.write(block)
+            return sha1.hexdigest()
+
+        blocks = queue.Queue(maxsize=self.QUEUE_DEPTH)
+        stop = threading.Event()
+        reader = threading.Thread(target=self._read_blocks,
+                                  args=(file_path, offset, zinfo.file_size, blocks, stop), daemon=True)
+        reader.start()
+        try:
+            with self.zipf.open(zinfo, 'w') as dest:
+                while (block := blocks.get()) is not None:
+                    if isinstance(block, BaseException):
+                        raise block
+                    sha1.update(block)
+                    dest.write(block)
+        finally:
+            # Unblock the reader if we bailed out early; the ring is free again once it exits
+            stop.set()
+            while reader.is_alive():
+                try:
+                    blocks.get_nowait()
+                except queue.Empty:
+                    reader.join(0.01)
+        return sha1.hexdigest()
+
+def create_zip_from_files(records, zip_path, compresslevel=1):
+    # Returns {source path: SHA-1} for the part cache
+    digests = {}
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel,
+                         strict_timestamps=False, allowZip64=True) as zipf:
+        writer = _StreamingZipWriter(zipf)
+        for rec in records:
+            zinfo = _zip_info(rec, _compress_type(rec.arcname), compresslevel)
+            digests[rec.path] = writer.write(rec.path, zinfo)
+    return digests
+
+class _HashingReader:
+    # File wrapper that hashes whatever tarfile reads through it
+    def __init__(self, f):
+        self.f = f
+        self.sha1 = hashlib.sha1()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sha1.update(data)
+        return data
+
+def create_tar_zst_from_files(records, archive_path):
+    # One zstd stream over the whole tar, so small files share a compression window.
+    # Returns {source path: SHA-1} for the part cache.
+    digests = {}
+    params = zstandard.ZstdCompressionParameters.from_level(3, window_log=27, enable_ldm=True, threads=-1)
+    with open(archive_path, "wb") as fh, \
+            zstandard.ZstdCompressor(compression_params=params).stream_writer(fh) as zst, \
+            tarfile.open(fileobj=zst, mode="w|") as tar:
+        for rec in records:
+            with open(rec.path, "rb") as src:
+                reader = _HashingReader(src)
+                tar.addfile(tar.gettarinfo(rec.path, arcname=rec.arcname), reader)
+            digests[rec.path] = reader.sha1.hexdigest()
+    return digests
+
+def _rejoinable_names(records):
+    # Flatten each relative path (extension included) so same-named files in
+    # different folders, or with different extensions, never share a zip
+    names, seen = [], set()
+    for rec in records:
+        name = base = rec.arcname.replace(os.sep, "_").replace("/", "_")
+        n = 1
+        while name in seen:
+            n += 1
+            name = f"{base}_{n}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+def split_large_file(rec, max_size, output_dir, folder_name, compresslevel=1):
+    # Each part is read straight from its byte range of the source into its own
+    # entry of the rejoinable zip; nothing is staged on disk in between
+    zip_path = output_dir / f"{folder_name}_rejoinable.zip"
+    # parts have no suffix, so pick compression from the source
+    compress_type = _compress_type(rec.arcname)
+    sha1 = hashlib.sha1()
+    digest = sha1.hexdigest()
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel,
+                         strict_timestamps=False, allowZip64=True) as zipf:
+        writer = _StreamingZipWriter(zipf)
+        for part_num, offset in enumerate(range(0, rec.size, max_size), 1):
+            part = rec._replace(arcname=f"{folder_name}_part{part_num}",
+                                size=min(max_size, rec.size - offset))
+            digest = writer.write(rec.path, _zip_info(part, compress_type, compresslevel), offset, sha1)
+
+    return zip_path.name, {rec.path: digest}
+
+def stage_upload(uploaded_file, dest):
+    # Streamlit uploads are in-memory BytesIO; write straight from their buffer
+    # without materialising another copy
+    with open(dest, "wb") as out:
+        if hasattr(uploaded_file, "getbuffer"):
+            out.write(uploaded_file.getbuffer())
+        else:
+            shutil.copyfileobj(uploaded_file, out, 1 << 20)
+
+def _pack_decreasing(sizes, capacity):
+    # Largest first; each item goes into the bin with the most room left, and a
+    # new bin is opened only when even that one can't take it. O(n log n).
+    sizes = np.fromiter(sizes, dtype=np.int64)
+    bins, heap = [], []  # heap of (-remaining capacity, bin index)
+    for i in np.argsort(-sizes, kind="stable").tolist():
+        size = int(sizes[i])
+        if heap and -heap[0][0] >= size:
+            neg_remaining, b = heapq.heappop(heap)
+            bins[b].append(i)
+            heapq.heappush(heap, (neg_remaining + size, b))
+        else:
+            bins.append([i])
+            heapq.heappush(heap, (size - capacity, len(bins) - 1))
+    return bins
+
+def _build_part(part_num, records, output_dir, output_format="zip", compresslevel=1):
+    # Runs in a worker process, so it must stay a top-level function
+    part_path = Path(output_dir) / f"independent_part{part_num}.{output_format}"
+    if output_format == "tar.zst":
+        digests = create_tar_zst_from_files(records, part_path)
+    else:
+        digests = create_zip_from_files(records, part_path, compresslevel=compresslevel)
+    return part_path.name, digests
+
+# --- Part cache ---
+# Remembers which sources each part zip was built from, so a rerun with the same
+# files and chunk size reuses the zip instead of compressing it again
+def open_part_cache(base_dir):
+    cache = sqlite3.connect(Path(base_dir) / "cache.db")
+    cache.execute("""CREATE TABLE IF NOT EXISTS parts (
+        path TEXT, chunk_size INT, size INT, mtime REAL, sha1 TEXT, part TEXT, part_mtime REAL,
+        PRIMARY KEY (path, chunk_size))""")
+    return cache
+
+def _sha1(file_path):
+    sha1 = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        while block := f.read(_StreamingZipWriter.BLOCK_SIZE):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def _needs_digest(cache, chunk_size, inventory):
+    # Sources whose cached size matches but mtime doesn't. Re-staged uploads always
+    # land here, and only their content can tell whether the cached part still holds.
+    if cache is None:
+        return []
+    rows = {path: (size, mtime) for path, size, mtime in cache.execute(
+        "SELECT path, size, mtime FROM parts WHERE chunk_size = ?", (chunk_size,))}
+    return [rec.path for rec in inventory
+            if rec.path in rows and rows[rec.path][0] == rec.size and rows[rec.path][1] != rec.mtime]
+
+def _cached_part(cache, chunk_size, part, records, output_dir, digests):
+    part_path = Path(output_dir) / part
+    if cache is None or not part_path.exists():
+        return False
+    part_mtime = part_path.stat().st_mtime
+    rows = {row[0]: row[1:] for row in cache.execute(
+        "SELECT path, size, mtime, sha1, part_mtime FROM parts WHERE chunk_size = ? AND part = ?",
+        (chunk_size, part))}
+    if len(rows) != len(records):
+        return False
+    for rec in records:
+        row = rows.get(rec.path)
+        if row is None or row[0] != rec.size or row[3] != part_mtime:
+            return False
+        # A changed mtime alone doesn't invalidate the part if the content is the same
+        if row[1] != rec.mtime and row[2] != digests.get(rec.path):
+            return False
+    return True
+
+def _record_part(cache, chunk_size, part, records, output_dir, digests):
+    if cache is None:
+        return
+    part_mtime = (Path(output_dir) / part).stat().st_mtime
+    # Forget sources that were in an earlier build of this part but aren't any more
+    cache.execute("DELETE FROM parts WHERE chunk_size = ? AND part = ?", (chunk_size, part))
+    cache.executemany(
+        "INSERT OR REPLACE INTO parts VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(rec.path, chunk_size, rec.size, rec.mtime, digests[rec.path], part, part_mtime)
+         for rec in records])
+    cache.commit()
+
+def _mp_context():
+    # Never fork the multi-threaded Streamlit server; workers start from a clean
+    # interpreter and import this module
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+def split_folder_intelligently(inventory, max_chunk_size, output_dir, cache=None, output_format="zip"):
+    large_files = [rec for rec in inventory if rec.size > max_chunk_size]
+    small_files = [rec for rec in inventory if rec.size <= max_chunk_size]
+
+    bins = _pack_decreasing((rec.size for rec in small_files), max_chunk_size)
+    plans = [(part_num, [small_files[i] for i in idx]) for part_num, idx in enumerate(bins, 1)]
+
+    rejoinable, zip_parts = [], []
+    jobs = []
+    for rec, name in zip(large_files, _rejoinable_names(large_files)):
+        jobs.append((rejoinable, f"{name}_rejoinable.zip", [rec],
+                     (split_large_file, rec, max_chunk_size, Path(output_dir), name)))
+    for part_num, records in plans:
+        jobs.append((zip_parts, f"independent_part{part_num}.{output_format}", records,
+                     (_build_part, part_num, records, output_dir, output_format)))
+
+    # Each part is compressed independently, so build the stale ones in parallel
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=_mp_context(),
+                             initializer=_use_fast_zlib) as pool:
+        stale = _needs_digest(cache, max_chunk_size, inventory)
+        stale_digests = dict(zip(stale, pool.map(_sha1, stale, chunksize=16)))
+        futures = [None if _cached_part(cache, max_chunk_size, part, records, output_dir, stale_digests)
+                   else pool.submit(*call)
+                   for _, part, records, call in jobs]
+        for (names, part, records, _), future in zip(jobs, futures):
+            if future is not None:
+                # Workers hash each source while reading it for the part
+                _, part_digests = future.result()
+                _record_part(cache, max_chunk_size, part, records, output_dir, part_digests)
+            names.append(part)
+
+    return rejoinable, zip_parts
+
+# --- Final ZIP creator ---
+def create_final_zip(rejoinable_chunks, independent_chunks, output_dir):
+    final_path = Path(output_dir) / "ALL_CHUNKS.zip"
+    # Members are zips already, so just store them
+    with zipfile.ZipFile(final_path, 'w', zipfile.ZIP_STORED, strict_timestamps=False, allowZip64=True) as allzip:
+        for zip_file in rejoinable_chunks:
+            arcname = f"Rejoinable/{zip_file}"
+            allzip.write(Path(output_dir) / zip_file, arcname=arcname)
+
+        for zip_file in independent_chunks:
+            arcname = f"Independent/{zip_file}"
+            allzip.write(Path(output_dir) / zip_file, arcname=arcname)
+
+        readme = """
+README - How to use this ZIP archive
+
+This archive contains chunked ZIP files divided into two categories:
+
+1. Rejoinable/
+   - Contains parts of large files (e.g., PDFs, videos) that were split due to size.
+   - Use tools like 7-Zip, WinRAR, or `cat` to merge before extracting.
+
+2. Independent/
+   - Contains ZIPs (or .tar.zst archives) of small files or folders which can be used independently.
+"""
+        allzip.writestr("README.txt", readme.strip())
+
+    return final_path